@@ -2,6 +2,9 @@ import time
 import hmac
 import hashlib
 import requests
+import aiohttp
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import math
 import numpy as np
@@ -10,17 +13,59 @@ from datetime import datetime, timedelta
 import random
 import yfinance as yf
 import talib
+from talib import abstract, stream
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+    from pyarrow import parquet as pq
+except ImportError:  # pyarrow is optional; price files are then parsed with pandas
+    pa = None
+try:
+    import orjson
+except ImportError:  # orjson is optional; trade records then use the stdlib json module
+    orjson = None
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
 import config
 import os
 import csv, json
+import queue
+import threading
+import atexit
+import asyncio
 import time
 from functools import wraps
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 import yfinance.exceptions
 import random
 
 # Update retry decorator
 def retry_on_rate_limit(max_retries=3, initial_delay=30):
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            # Coroutines back off with asyncio.sleep so other fetches keep running meanwhile
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                retries = 0
+                delay = initial_delay
+                while retries < max_retries:
+                    try:
+                        return await func(*args, **kwargs)
+                    except yfinance.exceptions.YFRateLimitError as e:
+                        logging.warning(f"Rate limit error in {func.__name__}: {e}. Retrying in {delay} seconds...")
+                        await asyncio.sleep(delay)
+                        retries += 1
+                        delay *= 2  # Exponential backoff
+                logging.error(f"Max retries ({max_retries}) reached for {func.__name__}. Skipping.")
+                return None
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             retries = 0
@@ -58,12 +103,21 @@ STOP_LOSS_PCT = 0.03
 TAKE_PROFIT_PCT = 0.06
 MIN_SCORE_THRESHOLD = 0.1
 MIN_PROFIT_SCORE = 10.0
-YF_HISTORICAL_PERIOD = "max"
+YF_HISTORICAL_PERIOD = "2y"  # Far more than the 200 bars the MA200 signal needs at 1h
+YF_FALLBACK_PERIOD = "6mo"  # Tried once when the main period returns no data
 YF_INTERVAL = "1h"
 DATA_DIR = "data"  # Directory for price and trade history files
+TRADE_LOG_FILENAME = os.path.join(DATA_DIR, "trade_log.jsonl")  # Every trade of every session, one JSON object per line
+SESSION_META_FILENAME = os.path.join(DATA_DIR, "_session.meta.json")  # Start and end summary of the latest session
 MAX_PRICE_RECORDS = 10000  # Limit for price history records
+RECENT_PRICE_SAMPLES = max(1, 60 // FETCH_INTERVAL)  # Latest prices per coin kept in memory, about a minute's worth
+PRICE_TRIM_SLACK = 1000  # Extra rows a price file may grow by before it is trimmed
 MAX_TRADE_RECORDS = 1000  # Limit for trade history records
+TRADE_TRIM_FACTOR = 2  # Trade files are trimmed once they hold this many times MAX_TRADE_RECORDS
 MAX_OPEN_TRADES = 5  # User-defined maximum number of open trades
+QTY_SCALE = 10000  # Order quantities are truncated to 1 / QTY_SCALE units
+STRATEGY_RESELECT_EVERY = 20  # Ticks a coin keeps its active strategy unless strategy performance changes
+MAX_FETCH_WORKERS = 16  # Concurrent HTTP requests when fetching tickers
 
 
 # Technical Indicator Parameters
@@ -73,16 +127,46 @@ RSI_OVERSOLD = 30
 MACD_FAST = 8
 MACD_SLOW = 21
 MACD_SIGNAL = 9
+# EMA smoothing factors for the online MACD
+MACD_K_FAST = 2 / (MACD_FAST + 1)
+MACD_K_SLOW = 2 / (MACD_SLOW + 1)
+MACD_K_SIGNAL = 2 / (MACD_SIGNAL + 1)
 BBANDS_PERIOD = 15
 BBANDS_NBDEV = 2
 STOCH_K = 10
 STOCH_D = 3
 STOCH_SLOWD = 3
+INDICATOR_LOOKBACK = max(RSI_PERIOD, MACD_SLOW, BBANDS_PERIOD, STOCH_K)
+PRICE_WINDOW = INDICATOR_LOOKBACK + 10  # Recent prices kept per coin for indicators and volatility
+
+# Roostoo pairs with Yahoo Finance history; the yfinance ticker is the pair with "/" replaced by "-"
+YF_PAIRS = frozenset({
+    "BTC/USD", "ETH/USD", "LTC/USD", "IMX/USD", "NEO/USD", "WLD/USD", "AVAX/USD", "ENA/USD",
+    "DOT/USD", "EGLD/USD", "ETC/USD", "ZEC/USD", "DYDX/USD", "ENS/USD", "INJ/USD", "QTUM/USD",
+    "RUNE/USD", "VET/USD", "MINA/USD", "AXS/USD", "PEOPLE/USD", "WIF/USD", "BNX/USD", "NEAR/USD",
+    "TRX/USD", "PEPE/USD", "RARE/USD", "GALA/USD", "BCH/USD", "TRUMP/USD", "FET/USD", "ALGO/USD",
+    "SUI/USD", "SHIB/USD", "ACH/USD", "DOGE/USD", "FLOKI/USD", "EOS/USD", "CAKE/USD", "OM/USD",
+    "RENDER/USD", "ADA/USD", "TAO/USD", "XRP/USD", "PENDLE/USD", "ZIL/USD", "HBAR/USD", "SOL/USD",
+    "BERA/USD", "TON/USD", "AR/USD", "SUSHI/USD", "BNB/USD", "JASMY/USD", "ATOM/USD", "GRT/USD",
+    "CRV/USD", "SUPER/USD", "POL/USD", "ICP/USD", "AAVE/USD", "SAND/USD", "XLM/USD", "FIL/USD",
+    "LINK/USD", "XTZ/USD", "STRAX/USD", "EIGEN/USD", "S/USD", "UNI/USD", "APT/USD"
+})
+
+# Prices the STOCH stream needs before it can be opened: TA-Lib's lookback plus the current price
+STOCH_MIN_HISTORY = abstract.Function("STOCH", fastk_period=STOCH_K, slowk_period=STOCH_D, slowd_period=STOCH_SLOWD).lookback + 1
 
 
 
 
 # --- UTILITY FUNCTIONS ---
+def yf_ticker(pair):
+    """Return the yfinance ticker for a Roostoo pair, or None if it has no Yahoo Finance history."""
+    return pair.replace("/", "-") if pair in YF_PAIRS else None
+
+def ticker_map(response):
+    """Return the pair -> ticker mapping of a successful ticker response, or an empty dict."""
+    return response["Data"] if response and response.get("Success") else {}
+
 def ensure_data_directory():
     """Ensure the data directory exists."""
     try:
@@ -90,90 +174,243 @@ def ensure_data_directory():
     except Exception as e:
         logging.error(f"Failed to create data directory {DATA_DIR}: {e}")
 
+def price_history_filename(coin):
+    return os.path.join(DATA_DIR, f"price_history_{coin}.csv")
+
+def trade_history_filename(coin):
+    return os.path.join(DATA_DIR, f"trade_history_{coin}.jsonl")
+
+def dumps_json_line(obj):
+    """Serialize obj as one compact, newline-terminated JSON line (bytes)."""
+    if orjson is not None:
+        # Trade fields can be NumPy scalars, which orjson only accepts with OPT_SERIALIZE_NUMPY
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj) + "\n").encode()
+
+def loads_json(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
 def read_price_history(coin):
-    """Read price data from a coin's CSV file."""
+    """Read a coin's CSV file into (timestamps, prices) arrays of at most MAX_PRICE_RECORDS rows.
+
+    Timestamps are returned as strings: epoch milliseconds, or ISO 8601 for rows written by older versions.
+    Rows still queued for the history writer are not included; call flush_history_writes() first when they matter.
+    """
     try:
-        filename = os.path.join(DATA_DIR, f"price_history_{coin}.csv")
+        filename = price_history_filename(coin)
         if os.path.exists(filename):
-            df = pd.read_csv(filename)
-            return df[["timestamp", "price"]].to_dict('records')
-        return []
+            if pa is not None:
+                table = pacsv.read_csv(filename, convert_options=pacsv.ConvertOptions(
+                    column_types={"timestamp": pa.string(), "price": pa.float64()},
+                    include_columns=["timestamp", "price"]))
+                timestamps = table.column("timestamp").to_numpy(zero_copy_only=False)
+                prices = table.column("price").to_numpy()
+            else:
+                df = pd.read_csv(filename, usecols=["timestamp", "price"], dtype={"timestamp": str, "price": np.float64})
+                timestamps = df["timestamp"].to_numpy()
+                prices = df["price"].to_numpy()
+            return timestamps[-MAX_PRICE_RECORDS:], prices[-MAX_PRICE_RECORDS:]
+        return np.array([], dtype=object), np.array([], dtype=np.float64)
     except Exception as e:
         logging.error(f"Failed to read price history for {coin}: {e}")
-        return []
+        return np.array([], dtype=object), np.array([], dtype=np.float64)
+
+_price_row_counts = {}  # coin -> data rows in its price history file
+
+def count_lines(filename):
+    """Count the lines in a file without parsing it."""
+    with open(filename, "rb") as f:
+        return sum(1 for _ in f)
+
+def count_data_rows(filename):
+    """Count the rows below the header of a CSV file."""
+    return max(count_lines(filename) - 1, 0)
+
+_recent_prices = defaultdict(lambda: deque(maxlen=RECENT_PRICE_SAMPLES))  # coin -> latest appended prices
+
+def recent_prices(coin):
+    """Return the latest prices appended for coin this session, oldest first, without touching disk."""
+    return list(_recent_prices.get(coin, ()))
+
+_price_windows = {}  # coin -> PriceWindow of its latest MAX_PRICE_RECORDS prices, the in-memory tail of its CSV file
+
+def _coin_price_window(coin):
+    window = _price_windows.get(coin)
+    if window is None:
+        # Seeded before this session queues any row for the coin, so the file on disk is complete
+        window = _price_windows[coin] = PriceWindow(MAX_PRICE_RECORDS)
+        window.extend(read_price_history(coin)[1])
+    return window
+
+def price_window(coin):
+    """Return up to MAX_PRICE_RECORDS latest prices for coin, oldest first; only the first call per coin reads disk."""
+    return _coin_price_window(coin).to_array()
 
 def append_price_history(coin, timestamp, price):
-    """Append price data to a coin's CSV file."""
+    """Queue price data to be appended to a coin's CSV file by the history writer thread."""
+    _coin_price_window(coin).append(price)
+    _recent_prices[coin].append(price)
+    _start_history_writer()
+    _history_queue.put(("price", coin, (timestamp, price)))
+
+def _write_price_rows(coin, rows):
     try:
         ensure_data_directory()
-        filename = os.path.join(DATA_DIR, f"price_history_{coin}.csv")
+        filename = price_history_filename(coin)
         file_exists = os.path.exists(filename)
+        if coin not in _price_row_counts:
+            _price_row_counts[coin] = count_data_rows(filename) if file_exists else 0
         with open(filename, "a", newline='') as f:
             writer = csv.writer(f)
             if not file_exists:
                 writer.writerow(["timestamp", "price"])
-            writer.writerow([timestamp.isoformat(), price])
-        
-        # Trim file if it exceeds MAX_PRICE_RECORDS
-        df = pd.read_csv(filename)
-        if len(df) > MAX_PRICE_RECORDS:
+            # Timestamps are stored as Unix epoch milliseconds, which is much cheaper to produce than isoformat()
+            writer.writerows([int(timestamp.timestamp() * 1000), price] for timestamp, price in rows)
+        _price_row_counts[coin] += len(rows)
+
+        # Trim back to MAX_PRICE_RECORDS only once the slack is used up, so most appends skip the rewrite
+        if _price_row_counts[coin] > MAX_PRICE_RECORDS + PRICE_TRIM_SLACK:
+            df = pd.read_csv(filename)
             df = df.tail(MAX_PRICE_RECORDS)
             df.to_csv(filename, index=False)
+            _price_row_counts[coin] = len(df)
     except Exception as e:
         logging.error(f"Failed to append price history for {coin}: {e}")
 
 def read_trade_history(coin):
-    """Read trade data from a coin's JSON file."""
+    """Read trade data from a coin's JSONL file (one trade per line), excluding trades still queued for writing."""
     try:
-        filename = os.path.join(DATA_DIR, f"trade_history_{coin}.json")
+        filename = trade_history_filename(coin)
         if os.path.exists(filename):
-            with open(filename, "r") as f:
-                trades = json.load(f)
-            return trades
+            with open(filename, "rb") as f:
+                trades = [loads_json(line) for line in f if line.strip()]
+            return trades[-MAX_TRADE_RECORDS:]
         return []
     except Exception as e:
         logging.error(f"Failed to read trade history for {coin}: {e}")
         return []
 
+_trade_row_counts = {}  # coin -> trades in its trade history file
+_trade_windows = {}  # coin -> deque of its latest MAX_TRADE_RECORDS trades, the in-memory tail of its JSONL file
+
+def _coin_trade_window(coin):
+    trades = _trade_windows.get(coin)
+    if trades is None:
+        # Seeded before this session queues any trade for the coin, so the file on disk is complete
+        trades = _trade_windows[coin] = deque(read_trade_history(coin), maxlen=MAX_TRADE_RECORDS)
+    return trades
+
+def recent_trades(coin):
+    """Return up to MAX_TRADE_RECORDS latest trades for coin, oldest first; only the first call per coin reads disk."""
+    return list(_coin_trade_window(coin))
+
 def append_trade_history(coin, trade):
-    """Append trade data to a coin's JSON file."""
+    """Queue trade data to be appended to a coin's JSONL file by the history writer thread."""
+    # Ensure trade timestamp is JSON-serializable
+    trade_copy = trade.copy()
+    trade_copy["timestamp"] = trade_copy["timestamp"].isoformat()
+    _coin_trade_window(coin).append(trade_copy)
+    _start_history_writer()
+    _history_queue.put(("trade", coin, trade_copy))
+
+def _write_trade_records(coin, trades):
     try:
         ensure_data_directory()
-        filename = os.path.join(DATA_DIR, f"trade_history_{coin}.json")
-        trades = read_trade_history(coin)
-        
-        # Ensure trade timestamp is JSON-serializable
-        trade_copy = trade.copy()
-        trade_copy["timestamp"] = trade_copy["timestamp"].isoformat()
-        trades.append(trade_copy)
-        
-        # Trim if exceeds MAX_TRADE_RECORDS
-        if len(trades) > MAX_TRADE_RECORDS:
-            trades = trades[-MAX_TRADE_RECORDS:]
-        
-        with open(filename, "w") as f:
-            json.dump(trades, f, indent=2)
+        filename = trade_history_filename(coin)
+        if coin not in _trade_row_counts:
+            _trade_row_counts[coin] = count_lines(filename) if os.path.exists(filename) else 0
+        with open(filename, "ab") as f:
+            f.writelines(dumps_json_line(trade) for trade in trades)
+        _trade_row_counts[coin] += len(trades)
+
+        # Trim lazily; readers only look at the last MAX_TRADE_RECORDS trades anyway
+        if _trade_row_counts[coin] > TRADE_TRIM_FACTOR * MAX_TRADE_RECORDS:
+            with open(filename, "rb") as f:
+                lines = f.readlines()[-MAX_TRADE_RECORDS:]
+            with open(filename, "wb") as f:
+                f.writelines(lines)
+            _trade_row_counts[coin] = len(lines)
     except Exception as e:
         logging.error(f"Failed to append trade history for {coin}: {e}")
 
+def _write_log_lines(filename, lines):
+    try:
+        ensure_data_directory()
+        with open(filename, "ab") as f:
+            f.writelines(lines)
+    except Exception as e:
+        logging.error(f"Failed to append trade log: {e}")
+
+# History files are written by one background thread so disk latency stays off the trading loop
+_history_queue = queue.Queue()
+_history_writer = None
+_history_writer_lock = threading.Lock()
+
+def _start_history_writer():
+    global _history_writer
+    with _history_writer_lock:
+        if _history_writer is None:
+            _history_writer = threading.Thread(target=_history_writer_loop, name="history-writer", daemon=True)
+            _history_writer.start()
+
+def _history_writer_loop():
+    while True:
+        # Block for one write, then take everything else already queued so each file is opened once per batch
+        batch = [_history_queue.get()]
+        while True:
+            try:
+                batch.append(_history_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            prices, trades, logs = {}, {}, {}
+            for kind, key, payload in batch:
+                target = prices if kind == "price" else trades if kind == "trade" else logs
+                target.setdefault(key, []).append(payload)
+            for coin, rows in prices.items():
+                _write_price_rows(coin, rows)
+            for coin, records in trades.items():
+                _write_trade_records(coin, records)
+            for filename, lines in logs.items():
+                _write_log_lines(filename, lines)
+        except Exception as e:
+            logging.error(f"History writer failed on a batch of {len(batch)} writes: {e}")
+        finally:
+            for _ in batch:
+                _history_queue.task_done()
+
+def flush_history_writes():
+    """Block until every queued price, trade and trade log write has reached disk."""
+    _history_queue.join()
+
+atexit.register(flush_history_writes)
+
 # --- API CLIENT ---
 class RoostooAPIClient:
     def __init__(self, api_key, secret_key, base_url=API_BASE_URL):
         self.api_key = api_key
         self.secret_key = secret_key.encode()
+        self._hmac = hmac.new(self.secret_key, digestmod=hashlib.sha256)  # Keyed once, copied per request
         self.base_url = base_url
+        self.session = requests.Session()  # Shared across threads so connections are pooled
+        # Keep-alive pool sized for concurrent ticker fetches; Retry skips POST so orders are never resent
+        self.session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=64,
+                                                   max_retries=Retry(total=3, backoff_factor=0.2)))
+        self.session.headers.update({"Content-Type": "application/x-www-form-urlencoded"})
 
     def _get_timestamp(self):
         return str(int(time.time() * 1000))
 
     def _sign(self, params: dict):
-        sorted_items = sorted(params.items())
-        query_string = '&'.join([f"{key}={value}" for key, value in sorted_items])
-        signature = hmac.new(self.secret_key, query_string.encode(), hashlib.sha256).hexdigest()
-        return signature, query_string
+        # The API signs the raw key=value string, so urlencode (which escapes "/" in pairs) cannot be used here
+        query_string = '&'.join(f"{key}={value}" for key, value in sorted(params.items()))
+        mac = self._hmac.copy()
+        mac.update(query_string.encode())
+        return mac.hexdigest(), query_string
 
     def _headers(self, params: dict, is_signed=False):
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        # Content-Type is set once on the session; only the signature headers vary per call
+        headers = {}
         if is_signed:
             signature, _ = self._sign(params)
             headers["RST-API-KEY"] = self.api_key
@@ -192,7 +429,7 @@ class RoostooAPIClient:
         return data
 
     def list_of_coins(self):
-        response = requests.get(self.base_url + "/v3/exchangeInfo")
+        response = self.session.get(self.base_url + "/v3/exchangeInfo")
         try:
             return [*self._handle_response(response)["TradePairs"]]
         except Exception as e:
@@ -206,16 +443,20 @@ class RoostooAPIClient:
             if pair:
                 params["pair"] = pair
             headers = self._headers(params, is_signed=False)
-            response = requests.get(url, params=params, headers=headers)
+            response = self.session.get(url, params=params, headers=headers)
             return self._handle_response(response)
         except Exception as e:
             logging.error(f"Error in get_ticker: {e}")
             return None
 
+    def get_all_tickers(self):
+        """Fetch every pair's ticker in one request; the endpoint returns all pairs when none is given."""
+        return self.get_ticker()
+
     def get_balance(self):
         try:
             params = {"timestamp": self._get_timestamp()}
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/v3/balance",
                 params=params,
                 headers=self._headers(params, is_signed=True))
@@ -236,7 +477,7 @@ class RoostooAPIClient:
             }
             if price:
                 params["price"] = price
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/v3/place_order",
                 data=params,
                 headers=self._headers(params, is_signed=True))
@@ -248,7 +489,7 @@ class RoostooAPIClient:
     def cancel_order(self, pair):
         try:
             params = {"timestamp": self._get_timestamp(), "pair": pair}
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/v3/cancel_order",
                 data=params,
                 headers=self._headers(params, is_signed=True))
@@ -257,96 +498,66 @@ class RoostooAPIClient:
             logging.error(f"Error in cancel_order: {e}")
             return None
 
+class AsyncRoostooAPIClient:
+    """aiohttp client for the unsigned market-data calls polled concurrently every cycle."""
+    def __init__(self, base_url=API_BASE_URL):
+        self.base_url = base_url
+        self.session = None
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=64))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        self.session = None
+
+    async def get_ticker(self, pair=None):
+        try:
+            params = {"timestamp": str(int(time.time() * 1000))}
+            if pair:
+                params["pair"] = pair
+            async with self.session.get(f"{self.base_url}/v3/ticker", params=params) as response:
+                if response.status != 200:
+                    logging.error(f"HTTP Error: {response.status} {await response.text()}")
+                    return None
+                return await response.json(content_type=None)
+        except Exception as e:
+            logging.error(f"Error in get_ticker: {e}")
+            return None
+
+    async def get_all_tickers(self):
+        """Fetch every pair's ticker in one request; the endpoint returns all pairs when none is given."""
+        return await self.get_ticker()
+
 # --- COIN SELECTION STRATEGY ---
 class CoinSelector:
     def __init__(self, api_client):
         self.api_client = api_client
-        self.price_history = {}
-        self.trade_history = {}
         self.historical_data = {}
         self.historical_data_timestamps = {}
-        self.recent_scores = []
-        self.ticker_mapping = {
-            "BTC/USD": "BTC-USD",
-            "ETH/USD": "ETH-USD",
-            "LTC/USD": "LTC-USD",
-            "IMX/USD": "IMX-USD",
-            "NEO/USD": "NEO-USD",
-            "WLD/USD": "WLD-USD",
-            "AVAX/USD": "AVAX-USD",
-            "ENA/USD": "ENA-USD",
-            "DOT/USD": "DOT-USD",
-            "EGLD/USD": "EGLD-USD",
-            "ETC/USD": "ETC-USD",
-            "ZEC/USD": "ZEC-USD",
-            "DYDX/USD": "DYDX-USD",
-            "ENS/USD": "ENS-USD",
-            "INJ/USD": "INJ-USD",
-            "QTUM/USD": "QTUM-USD",
-            "RUNE/USD": "RUNE-USD",
-            "VET/USD": "VET-USD",
-            "MINA/USD": "MINA-USD",
-            "AXS/USD": "AXS-USD",
-            "PEOPLE/USD": "PEOPLE-USD",
-            "WIF/USD": "WIF-USD",
-            "BNX/USD": "BNX-USD",
-            "NEAR/USD": "NEAR-USD",
-            "TRX/USD": "TRX-USD",
-            "PEPE/USD": "PEPE-USD",
-            "RARE/USD": "RARE-USD",
-            "GALA/USD": "GALA-USD",
-            "BCH/USD": "BCH-USD",
-            "TRUMP/USD": "TRUMP-USD",
-            "FET/USD": "FET-USD",
-            "ALGO/USD": "ALGO-USD",
-            "SUI/USD": "SUI-USD",
-            "SHIB/USD": "SHIB-USD",
-            "ACH/USD": "ACH-USD",
-            "DOGE/USD": "DOGE-USD",
-            "FLOKI/USD": "FLOKI-USD",
-            "EOS/USD": "EOS-USD",
-            "CAKE/USD": "CAKE-USD",
-            "OM/USD": "OM-USD",
-            "RENDER/USD": "RENDER-USD",
-            "ADA/USD": "ADA-USD",
-            "TAO/USD": "TAO-USD",
-            "XRP/USD": "XRP-USD",
-            "PENDLE/USD": "PENDLE-USD",
-            "ZIL/USD": "ZIL-USD",
-            "HBAR/USD": "HBAR-USD",
-            "SOL/USD": "SOL-USD",
-            "BERA/USD": "BERA-USD",
-            "TON/USD": "TON-USD",
-            "AR/USD": "AR-USD",
-            "SUSHI/USD": "SUSHI-USD",
-            "BNB/USD": "BNB-USD",
-            "JASMY/USD": "JASMY-USD",
-            "ATOM/USD": "ATOM-USD",
-            "GRT/USD": "GRT-USD",
-            "CRV/USD": "CRV-USD",
-            "SUPER/USD": "SUPER-USD",
-            "POL/USD": "POL-USD",
-            "ICP/USD": "ICP-USD",
-            "AAVE/USD": "AAVE-USD",
-            "SAND/USD": "SAND-USD",
-            "XLM/USD": "XLM-USD",
-            "FIL/USD": "FIL-USD",
-            "LINK/USD": "LINK-USD",
-            "XTZ/USD": "XTZ-USD",
-            "STRAX/USD": "STRAX-USD",
-            "EIGEN/USD": "EIGEN-USD",
-            "S/USD": "S-USD",
-            "UNI/USD": "UNI-USD",
-            "APT/USD": "APT-USD"
-        }
+        self.historical_metrics = {}  # ticker -> (fetch timestamp, metrics)
+        self._history_task = None  # Background refresh_history run, started by select_coins
+        self.cycle_scores = {}  # Scores computed during the current select_coins cycle
+        self.recent_scores = deque(maxlen=100)
         self.cache_duration = 172800  # Cache for 48 hours
         self.max_tickers_per_cycle = 10  # User-defined maximum number of tickers to process in one cycle
 
     def update_trade_history(self, coin, trade):
         append_trade_history(coin, trade)
 
+    @staticmethod
+    def _download_history(ticker):
+        """Blocking yfinance download, falling back to a shorter period when the long one is empty."""
+        asset = yf.Ticker(ticker)
+        for period in (YF_HISTORICAL_PERIOD, YF_FALLBACK_PERIOD):
+            hist = asset.history(period=period, interval=YF_INTERVAL)
+            if not hist.empty:
+                return hist
+        return None
+
     @retry_on_rate_limit(max_retries=5, initial_delay=10)
-    def fetch_historical_data(self, ticker):
+    async def fetch_historical_data(self, ticker):
         current_time = time.time()
         if ticker in self.historical_data and ticker in self.historical_data_timestamps:
             if current_time - self.historical_data_timestamps[ticker] < self.cache_duration:
@@ -354,77 +565,121 @@ class CoinSelector:
                 return self.historical_data[ticker]
 
         try:
-            asset = yf.Ticker(ticker)
-            hist = asset.history(period=YF_HISTORICAL_PERIOD, interval=YF_INTERVAL)
-            if hist.empty:
-                hist = asset.history(period="2y", interval=YF_INTERVAL)
-                if hist.empty:
-                    hist = asset.history(period="1y", interval=YF_INTERVAL)
-                    if hist.empty:
-                        hist = asset.history(period="6mo", interval="1h")
-                        if hist.empty:
-                            hist = asset.history(period="1y", interval="1d")
-                            if hist.empty:
-                                logging.warning(f"No historical data for {ticker}")
-                                return None
+            hist = await asyncio.to_thread(self._download_history, ticker)
+            if hist is None:
+                logging.warning(f"No historical data for {ticker}")
+                return None
             self.historical_data[ticker] = hist
             self.historical_data_timestamps[ticker] = current_time
             logging.info(f"Fetched and cached historical data for {ticker}")
-            time.sleep(random.uniform(0.5, 1.5))  # Random delay between requests
             return hist
+        except yfinance.exceptions.YFRateLimitError:
+            raise
         except Exception as e:
             logging.error(f"Error fetching historical data for {ticker}: {e}")
             return None
 
-    def calculate_historical_metrics(self, hist, coin=None):
-        # Prioritize local price history if sufficient data is available
-        if coin and self.price_history[coin] and len(self.price_history[coin]) >= 50:  # Reduced from 200
-                prices = np.array([float(record["price"]) for record in self.price_history[coin]])
-                closes = pd.Series(prices)
-                returns = closes.pct_change().dropna()
-                annualized_return = ((1 + returns.mean()) ** 252 - 1) * 100
-                volatility = returns.std() * np.sqrt(252) * 100
-                ma50 = closes.rolling(window=50).mean().iloc[-1]
-                ma200 = closes.rolling(window=min(200, len(closes))).mean().iloc[-1]  # Use available data
-                ma_signal = 1 if ma50 > ma200 else 0
-                logging.debug(f"Using local price history for {coin} metrics")
-                return annualized_return, volatility, ma_signal
-
-
+    @retry_on_rate_limit(max_retries=5, initial_delay=10)
+    async def refresh_historical_batch(self, tickers):
+        """Download history for every stale ticker in one multi-threaded yfinance call."""
+        current_time = time.time()
+        stale = [t for t in tickers if current_time - self.historical_data_timestamps.get(t, 0) >= self.cache_duration]
+        if not stale:
+            return
+        try:
+            data = await asyncio.to_thread(yf.download, stale, period=YF_HISTORICAL_PERIOD, interval=YF_INTERVAL,
+                                           group_by="ticker", threads=True, progress=False)
+        except yfinance.exceptions.YFRateLimitError:
+            raise
+        except Exception as e:
+            logging.error(f"Error batch fetching historical data: {e}")
+            return
+        refreshed = 0
+        for ticker in stale:
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                hist = data[ticker]
+            else:
+                hist = data
+            # Rows are aligned across tickers, so drop the ones this ticker has no data for
+            hist = hist.dropna(how="all")
+            if hist.empty:
+                continue  # Left stale so fetch_historical_data retries it with fallback periods
+            self.historical_data[ticker] = hist
+            self.historical_data_timestamps[ticker] = current_time
+            refreshed += 1
+        logging.info(f"Fetched and cached historical data for {refreshed}/{len(stale)} tickers in one batch")
+
+    async def _fetch_historical_bounded(self, ticker, semaphore):
+        """fetch_historical_data, holding one of the semaphore's slots for the download."""
+        async with semaphore:
+            return await self.fetch_historical_data(ticker)
+
+    async def refresh_history(self, tickers):
+        """Refresh stale history in one batch, then retry the tickers it missed one by one."""
+        await self.refresh_historical_batch(tickers)
+        # Tickers the batch left stale retry concurrently, at most MAX_FETCH_WORKERS downloads at a time
+        semaphore = asyncio.Semaphore(MAX_FETCH_WORKERS)
+        await asyncio.gather(*(self._fetch_historical_bounded(t, semaphore) for t in tickers))
+
+    def _compute_long_term_component(self, ticker):
+        """Return (annualized_return, volatility, ma_signal) for ticker, reused until its history is refetched."""
+        hist = self.historical_data.get(ticker)  # Refreshed in the background by refresh_history
+        fetched_at = self.historical_data_timestamps.get(ticker)
+        cached = self.historical_metrics.get(ticker)
+        if cached and cached[0] == fetched_at:
+            return cached[1]
+        metrics = self.calculate_historical_metrics(hist)
+        if hist is not None and fetched_at is not None:
+            self.historical_metrics[ticker] = (fetched_at, metrics)
+        return metrics
+
+    def calculate_historical_metrics(self, hist):
         if hist is None or len(hist) < 50:
             return 0, 0, 0
-        closes = hist["Close"]
-        returns = closes.pct_change().dropna()
+        closes = hist["Close"].dropna().to_numpy(dtype=np.float64)
+        if len(closes) < 50:
+            return 0, 0, 0
+        return self._price_metrics(closes)
+
+    @staticmethod
+    def _price_metrics(prices):
+        """Annualized return, volatility and MA50/MA200 signal from a price array."""
+        # Only the latest moving averages are needed, so average the tail slices directly
+        returns = np.diff(prices) / prices[:-1]
         annualized_return = ((1 + returns.mean()) ** 252 - 1) * 100
-        volatility = returns.std() * np.sqrt(252) * 100
-        ma50 = closes.rolling(window=50).mean().iloc[-1]
-        ma200 = closes.rolling(window=200).mean().iloc[-1]
+        volatility = returns.std(ddof=1) * np.sqrt(252) * 100
+        ma50 = prices[-50:].mean()
+        ma200 = prices[-200:].mean() if len(prices) >= 200 else np.nan
         ma_signal = 1 if ma50 > ma200 else 0
         return annualized_return, volatility, ma_signal
 
     def calculate_coin_score(self, coin, pair):
+        if coin in self.cycle_scores:
+            return self.cycle_scores[coin]
         score = 0
-        price_history = read_price_history(coin)
-        if price_history and len(price_history) >= 10:
-            prices = np.array([float(record["price"]) for record in price_history])
+        prices = price_window(coin)
+        if len(prices) >= 10:
             short_term_volatility = np.std(prices) / np.mean(prices)
             score += short_term_volatility * 50
         else:
             score += 0.1
 
-        trade_history = read_trade_history(coin)
+        trade_history = recent_trades(coin)
         if trade_history:
-            profits = [t["profit_pct"] for t in trade_history if "profit_pct" in t]
-            avg_profit = np.mean(profits) if profits else 0
-            win_rate = len([p for p in profits if p > 0]) / len(profits) if profits else 0.5
+            # BUY and FINAL_SELL records have no profit_pct; they become NaN and are masked out
+            profits = np.fromiter((t.get("profit_pct", np.nan) for t in trade_history), dtype=np.float64, count=len(trade_history))
+            profits = profits[~np.isnan(profits)]
+            avg_profit = profits.mean() if profits.size else 0
+            win_rate = (profits > 0).mean() if profits.size else 0.5
             score += avg_profit * 10 + win_rate * 20
         else:
             score += 0.2
 
-        ticker = self.ticker_mapping.get(pair, None)
+        ticker = yf_ticker(pair)
         if ticker:
-            hist = self.fetch_historical_data(ticker)
-            annualized_return, long_term_volatility, ma_signal = self.calculate_historical_metrics(hist, coin)
+            annualized_return, long_term_volatility, ma_signal = self._compute_long_term_component(ticker)
             score += annualized_return * 0.5
             score += long_term_volatility * 0.2
             score += ma_signal * 10
@@ -432,49 +687,205 @@ class CoinSelector:
             score += 0.1
 
         score = max(score, MIN_SCORE_THRESHOLD)
+        self.cycle_scores[coin] = score
         self.recent_scores.append(score)
-        if len(self.recent_scores) > 100:
-            self.recent_scores.pop(0)
         return score
     
     def get_dynamic_score_threshold(self):
         if not self.recent_scores:
             return MIN_PROFIT_SCORE
-        # Use 75th percentile of recent scores as threshold
-        return np.percentile(self.recent_scores, 75)
-
-    def select_coins(self):
-        available_pairs = self.api_client.list_of_coins()
+        # Use 75th percentile of recent scores as threshold, interpolated like np.percentile
+        # but partitioning around the two neighbouring ranks instead of fully sorting
+        scores = np.fromiter(self.recent_scores, dtype=np.float64, count=len(self.recent_scores))
+        rank = 0.75 * (len(scores) - 1)
+        lower, upper = math.floor(rank), math.ceil(rank)
+        scores = np.partition(scores, (lower, upper))
+        return scores[lower] + (scores[upper] - scores[lower]) * (rank - lower)
+
+    async def select_coins(self, held=()):
+        """Select this cycle's top-scoring pairs, plus the held pairs so their exits keep firing."""
+        available_pairs = await asyncio.to_thread(self.api_client.list_of_coins)
         if not available_pairs:
             return [("BTC", "BTC/USD")]
+        self.cycle_scores = {}
+        # One bulk request covers every pair; only the pairs it misses are fetched one by one
+        ticker_data = ticker_map(await asyncio.to_thread(self.api_client.get_all_tickers))
+        missing = [pair for pair in available_pairs if pair not in ticker_data]
+        if missing:
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+                ticker_results = await asyncio.gather(
+                    *(loop.run_in_executor(executor, self.api_client.get_ticker, pair) for pair in missing))
+            for result in ticker_results:
+                ticker_data.update(ticker_map(result))
+        timestamp = datetime.now()  # The tickers were fetched together, so they share one timestamp
         for pair in available_pairs:
-            ticker_data = self.api_client.get_ticker(pair=pair)
-            if ticker_data and ticker_data.get("Success"):
-                price = float(ticker_data["Data"][pair]["LastPrice"])
+            if pair in ticker_data:
+                price = float(ticker_data[pair]["LastPrice"])
                 coin = pair.split("/")[0]
-                timestamp = datetime.now()
                 append_price_history(coin, timestamp, price)
+        # History refreshes in the background, so a rate-limited download never stalls the tick;
+        # scoring uses whatever history is already cached
+        if self._history_task is None or self._history_task.done():
+            tickers = [yf_ticker(p) for p in available_pairs if p in YF_PAIRS]
+            self._history_task = asyncio.create_task(self.refresh_history(tickers))
         # Process all pairs
-        coin_scores = []
-        for pair in available_pairs:
-            coin = pair.split("/")[0]
-            score = self.calculate_coin_score(coin, pair)
-            coin_scores.append((coin, pair, score))
-            time.sleep(random.uniform(0.2, 0.8))
+        scores = np.empty(len(available_pairs), dtype=np.float64)
+        for i, pair in enumerate(available_pairs):
+            scores[i] = self.calculate_coin_score(pair.split("/")[0], pair)
         min_profit_score = max(MIN_PROFIT_SCORE, self.get_dynamic_score_threshold())
-        coin_scores.sort(key=lambda x: x[2], reverse=True)
-        selected = [(c, p) for c, p, s in coin_scores if s >= min_profit_score]
-        if not selected and coin_scores:
-            selected = [(coin_scores[0][0], coin_scores[0][1])]
-        logging.info(f"Selected {len(selected)} coins: {[c for c, p in selected]}, Scores: {[s for _, _, s in coin_scores if s >= min_profit_score]}")
+
+        # Keep the top max_tickers_per_cycle pairs above the threshold; argpartition avoids sorting the rest
+        candidates = np.flatnonzero(scores >= min_profit_score)
+        if candidates.size > self.max_tickers_per_cycle:
+            top = np.argpartition(-scores[candidates], self.max_tickers_per_cycle - 1)[:self.max_tickers_per_cycle]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        if not candidates.size:
+            candidates = np.array([np.argmax(scores)])
+        selected = [(available_pairs[i].split("/")[0], available_pairs[i]) for i in candidates]
+        # Held coins bypass the cap, otherwise a coin that drops out of the top K never hits its stop-loss or take-profit
+        chosen = {coin for coin, _ in selected}
+        selected += [(coin, pair) for coin, pair in held if coin not in chosen]
+        logging.info(f"Selected {len(selected)} coins: {[c for c, p in selected]}, Scores: {scores[candidates].round(2).tolist()}")
         return selected
 
 # --- TRADING STRATEGY ---
+class StrategyState:
+    """Per-coin strategy state, read and written on every tick."""
+    __slots__ = ("no", "price_mean", "position_status", "buy_price", "stop_loss_price", "take_profit_price", "active_strategy",
+                 "strategy_tick", "strategy_dirty", "tick_signals", "rsi_avg_gain", "rsi_avg_loss", "rsi",
+                 "ema_fast", "ema_slow", "ema_signal", "macd", "macd_signal",
+                 "bb_window", "bb_sum", "bb_sumsq", "bb_upper", "bb_middle", "bb_lower")
+
+    def __init__(self, active_strategy):
+        self.no = 0
+        self.price_mean = 0
+        self.position_status = "CASH"
+        self.buy_price = None
+        self.stop_loss_price = None
+        self.take_profit_price = None
+        self.active_strategy = active_strategy
+        self.strategy_tick = 0  # Value of no when active_strategy was last selected
+        self.strategy_dirty = True  # Set when strategy performance changes, forcing a reselection
+        self.tick_signals = None  # MACD, RSI and BBands signals of the current tick, consumed by combined_strategy
+        # Wilder-smoothed average gain/loss; NaN RSI until RSI_PERIOD price changes have been seen
+        self.rsi_avg_gain = 0.0
+        self.rsi_avg_loss = 0.0
+        self.rsi = np.nan
+        # MACD EMAs hold running sums for their SMA seeds until enough prices have been seen
+        self.ema_fast = 0.0
+        self.ema_slow = 0.0
+        self.ema_signal = 0.0
+        self.macd = np.nan
+        self.macd_signal = np.nan
+        # Last BBANDS_PERIOD prices with their running sum and sum of squares
+        self.bb_window = deque(maxlen=BBANDS_PERIOD)
+        self.bb_sum = 0.0
+        self.bb_sumsq = 0.0
+        self.bb_upper = np.nan
+        self.bb_middle = np.nan
+        self.bb_lower = np.nan
+
+class PriceWindow:
+    """Fixed-size ring buffer of a coin's most recent prices."""
+    __slots__ = ("values", "head", "count")
+
+    def __init__(self, size):
+        self.values = np.empty(size, dtype=np.float64)
+        self.head = 0  # Slot the next price is written to; holds the oldest price once the buffer is full
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def is_full(self):
+        return self.count == len(self.values)
+
+    def last(self):
+        return float(self.values[self.head - 1])
+
+    def oldest_pair(self):
+        """Return the two oldest prices of a full window, the first being the one the next append overwrites."""
+        return float(self.values[self.head]), float(self.values[(self.head + 1) % len(self.values)])
+
+    def append(self, price):
+        self.values[self.head] = price
+        self.head = (self.head + 1) % len(self.values)
+        if self.count < len(self.values):
+            self.count += 1
+
+    def extend(self, prices):
+        """Append an array of prices, oldest first."""
+        prices = prices[-len(self.values):]
+        self.values[(self.head + np.arange(len(prices))) % len(self.values)] = prices
+        self.head = (self.head + len(prices)) % len(self.values)
+        self.count = min(self.count + len(prices), len(self.values))
+
+    def to_array(self):
+        """Return the buffered prices oldest first; a view until the buffer has wrapped, then a copy."""
+        if not self.is_full():
+            return self.values[:self.count]
+        return np.concatenate((self.values[self.head:], self.values[:self.head]))
+
+SIGNAL_HOLD = 0
+SIGNAL_BUY = 1
+SIGNAL_SELL = 2
+SIGNAL_STOP_LOSS = 3
+SIGNAL_TAKE_PROFIT = 4
+SIGNAL_NAMES = ("HOLD", "BUY", "SELL", "SELL", "SELL")  # Stop-loss and take-profit exits are sells
+
+STRATEGY_IDS = {
+    "mean_reversion": 0,
+    "macd_crossover": 1,
+    "rsi_strategy": 2,
+    "bollinger_bands": 3,
+    "combined": 4
+}
+
+def _as_float(value):
+    return np.nan if value is None else value
+
+@njit(cache=True)
+def evaluate_signal(strategy_id, price, holding, buy_price, stop_loss_price, take_profit_price, price_mean,
+                    rsi, macd, macd_signal, bb_upper, bb_lower, stoch_k, stoch_d):
+    """Return the SIGNAL_* code for one strategy; missing values are passed as NaN and never trigger."""
+    if holding:
+        if price <= stop_loss_price:
+            return SIGNAL_STOP_LOSS
+        if price >= take_profit_price:
+            return SIGNAL_TAKE_PROFIT
+
+    if strategy_id == 0:  # mean_reversion
+        if price_mean > price and not holding:
+            return SIGNAL_BUY
+        if price > price_mean and holding and price > buy_price * 1.003:
+            return SIGNAL_SELL
+    elif strategy_id == 1:  # macd_crossover
+        if macd > macd_signal and rsi < RSI_OVERBOUGHT and not holding:
+            return SIGNAL_BUY
+        if macd < macd_signal and rsi > RSI_OVERSOLD and holding:
+            return SIGNAL_SELL
+    elif strategy_id == 2:  # rsi_strategy
+        if rsi < RSI_OVERSOLD and stoch_k < 20 and stoch_k > stoch_d and not holding:
+            return SIGNAL_BUY
+        if rsi > RSI_OVERBOUGHT and stoch_k > 80 and stoch_k < stoch_d and holding:
+            return SIGNAL_SELL
+    elif strategy_id == 3:  # bollinger_bands
+        if price < bb_lower and rsi < RSI_OVERSOLD and not holding:
+            return SIGNAL_BUY
+        if price > bb_upper and rsi > RSI_OVERBOUGHT and holding:
+            return SIGNAL_SELL
+    return SIGNAL_HOLD
+
+
 class AutonomousStrategy:
     def __init__(self, lookback_period=20):
         self.lookback_period = lookback_period
         self.strategies = {}
         self.price_data = {}
+        self.return_stats = {}  # Running mean/M2 of the returns inside each coin's price window
+        self.stoch_streams = {}  # coin -> TA-Lib STOCH stream handle, opened once the coin has enough history
         self.strategy_performance = {}
         self.strategy_trade_count = {}  # Track trade counts
         self.available_strategies = [
@@ -487,13 +898,12 @@ class AutonomousStrategy:
     
     def calculate_risk_levels(self, coin, entry_price):
         """Calculate dynamic stop-loss and take-profit percentages based on volatility."""
-        prices = np.array(self.price_data.get(coin, []))
-        if len(prices) < 10:
+        if coin not in self.price_data or len(self.price_data[coin]) < 10:
             return 0.01, 0.03  # Default values if insufficient data
         
-        # Calculate volatility as standard deviation of percentage price changes
-        returns = np.diff(prices) / prices[:-1]
-        volatility = np.std(returns) if len(returns) > 0 else 0.01
+        # Volatility is the standard deviation of percentage price changes, kept up to date by update_price_data
+        stats = self.return_stats[coin]
+        volatility = math.sqrt(max(stats["m2"], 0.0) / stats["n"]) if stats["n"] > 0 else 0.01
         
         # Stop-loss: 1.5x volatility, capped at 5%, floored at 1%
         stop_loss_pct = min(max(1.5 * volatility, 0.01), 0.05)
@@ -507,53 +917,86 @@ class AutonomousStrategy:
     def set_risk_levels(self, coin, entry_price):
         state = self.get_strategy_state(coin)
         stop_loss_pct, take_profit_pct = self.calculate_risk_levels(coin, entry_price)
-        state["buy_price"] = entry_price
-        state["stop_loss_price"] = entry_price * (1 - stop_loss_pct)
-        state["take_profit_price"] = entry_price * (1 + take_profit_pct)
-        logging.info(f"{coin} - Set Stop Loss: {state['stop_loss_price']:.6f} ({stop_loss_pct*100:.2f}%), Take Profit: {state['take_profit_price']:.6f} ({take_profit_pct*100:.2f}%)")
+        state.buy_price = entry_price
+        state.stop_loss_price = entry_price * (1 - stop_loss_pct)
+        state.take_profit_price = entry_price * (1 + take_profit_pct)
+        logging.info(f"{coin} - Set Stop Loss: {state.stop_loss_price:.6f} ({stop_loss_pct*100:.2f}%), Take Profit: {state.take_profit_price:.6f} ({take_profit_pct*100:.2f}%)")
 
     def get_strategy_state(self, coin):
         if coin not in self.strategies:
-            self.strategies[coin] = {
-                "no": 0,
-                "price_mean": 0,
-                "position_status": "CASH",
-                "buy_price": None,
-                "stop_loss_price": None,
-                "take_profit_price": None,
-                "active_strategy": random.choice(self.available_strategies)
-            }
+            self.strategies[coin] = StrategyState(random.choice(self.available_strategies))
             if coin not in self.price_data:
-                self.price_data[coin] = []
+                self.price_data[coin] = PriceWindow(PRICE_WINDOW)
+                self.return_stats[coin] = {"n": 0, "mean": 0.0, "m2": 0.0}
             if coin not in self.strategy_performance:
                 self.strategy_performance[coin] = {strat: 0.1 for strat in self.available_strategies}  # Small positive initial score
                 self.strategy_trade_count[coin] = {strat: 1 for strat in self.available_strategies}  # Avoid division by zero
-            return self.strategies[coin]
+        return self.strategies[coin]
+
+    def _add_return(self, coin, value):
+        # Welford update when a return enters the window
+        stats = self.return_stats[coin]
+        stats["n"] += 1
+        delta = value - stats["mean"]
+        stats["mean"] += delta / stats["n"]
+        stats["m2"] += delta * (value - stats["mean"])
+
+    def _remove_return(self, coin, value):
+        # Inverse Welford update when a return leaves the window
+        stats = self.return_stats[coin]
+        if stats["n"] <= 1:
+            stats["n"], stats["mean"], stats["m2"] = 0, 0.0, 0.0
+            return
+        old_mean = stats["mean"]
+        stats["n"] -= 1
+        stats["mean"] = (old_mean * (stats["n"] + 1) - value) / stats["n"]
+        stats["m2"] -= (value - old_mean) * (value - stats["mean"])
 
     def update_price_data(self, coin, price):
-        self.price_data[coin].append(price)
-        if len(self.price_data[coin]) > max(RSI_PERIOD, MACD_SLOW, BBANDS_PERIOD, STOCH_K) + 10:
-            self.price_data[coin].pop(0)
+        prices = self.price_data[coin]
+        if len(prices):
+            last = prices.last()
+            self._add_return(coin, (price - last) / last)
+        if prices.is_full():
+            # The append overwrites the oldest price, taking its return out of the window
+            oldest, next_oldest = prices.oldest_pair()
+            self._remove_return(coin, (next_oldest - oldest) / oldest)
+        prices.append(price)
+        self._update_stoch(coin, price)
+
+    def _update_stoch(self, coin, price):
+        """Advance the coin's STOCH stream by one price, opening it on the price window once there is enough history."""
+        handle = self.stoch_streams.get(coin)
+        if handle is not None:
+            handle.update(price, price, price)  # High, low and close are all the last price
+            return
+        if len(self.price_data[coin]) < STOCH_MIN_HISTORY:
+            return  # Still warming up; skip building the window just to have TA-Lib reject it
+        history = self.price_data[coin].to_array()
+        try:
+            self.stoch_streams[coin] = stream.STOCH(history, history, history, fastk_period=STOCH_K,
+                                                    slowk_period=STOCH_D, slowd_period=STOCH_SLOWD)
+        except talib.InsufficientHistory:
+            pass
 
     def calculate_indicators(self, coin):
-        prices = np.array(self.price_data[coin])
-        if len(prices) < max(RSI_PERIOD, MACD_SLOW, BBANDS_PERIOD, STOCH_K) + 1:
+        if len(self.price_data[coin]) < INDICATOR_LOOKBACK + 1:
             return None
+        # Indicators still warming up (MACD needs the most history) report NaN, which never triggers a signal
+        state = self.strategies[coin]
+        stoch = self.stoch_streams.get(coin)
 
         # RSI
-        rsi = talib.RSI(prices, timeperiod=RSI_PERIOD)[-1]
+        rsi = state.rsi
 
         # MACD
-        macd, signal, _ = talib.MACD(prices, fastperiod=MACD_FAST, slowperiod=MACD_SLOW, signalperiod=MACD_SIGNAL)
-        macd, signal = macd[-1], signal[-1]
+        macd, signal = state.macd, state.macd_signal
 
         # Bollinger Bands
-        upper, middle, lower = talib.BBANDS(prices, timeperiod=BBANDS_PERIOD, nbdevup=BBANDS_NBDEV, nbdevdn=BBANDS_NBDEV)
-        upper, middle, lower = upper[-1], middle[-1], lower[-1]
+        upper, middle, lower = state.bb_upper, state.bb_middle, state.bb_lower
 
         # Stochastic Oscillator
-        slowk, slowd = talib.STOCH(prices, prices, prices, fastk_period=STOCH_K, slowk_period=STOCH_D, slowd_period=STOCH_SLOWD)
-        slowk, slowd = slowk[-1], slowd[-1]
+        slowk, slowd = stoch.value if stoch is not None else (np.nan, np.nan)
 
         return {
             "rsi": rsi,
@@ -566,14 +1009,87 @@ class AutonomousStrategy:
             "stoch_d": slowd
         }
 
+    def _update_rsi(self, state, change):
+        """Fold one price change into the coin's RSI, seeded and smoothed the same way as TA-Lib."""
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        if state.no <= RSI_PERIOD:  # state.no counts the changes so far, this one included
+            # Sum the first RSI_PERIOD changes and average them once, as the seed
+            state.rsi_avg_gain += gain
+            state.rsi_avg_loss += loss
+            if state.no < RSI_PERIOD:
+                return
+            state.rsi_avg_gain /= RSI_PERIOD
+            state.rsi_avg_loss /= RSI_PERIOD
+        else:
+            state.rsi_avg_gain = (state.rsi_avg_gain * (RSI_PERIOD - 1) + gain) / RSI_PERIOD
+            state.rsi_avg_loss = (state.rsi_avg_loss * (RSI_PERIOD - 1) + loss) / RSI_PERIOD
+        total = state.rsi_avg_gain + state.rsi_avg_loss
+        state.rsi = 100 * state.rsi_avg_gain / total if total else 0.0
+
+    def _update_macd(self, state, price):
+        """Advance the coin's MACD EMAs by one price, seeded the same way as TA-Lib."""
+        n = state.no + 1  # Prices seen, this one included
+        if n < MACD_SLOW:
+            # Both EMAs are seeded with an SMA: the slow one over these first prices, the fast one over their tail
+            state.ema_slow += price
+            if n > MACD_SLOW - MACD_FAST:
+                state.ema_fast += price
+            return
+        if n == MACD_SLOW:
+            state.ema_slow = (state.ema_slow + price) / MACD_SLOW
+            state.ema_fast = (state.ema_fast + price) / MACD_FAST
+        else:
+            state.ema_slow += (price - state.ema_slow) * MACD_K_SLOW
+            state.ema_fast += (price - state.ema_fast) * MACD_K_FAST
+        macd = state.ema_fast - state.ema_slow
+
+        count = n - MACD_SLOW + 1  # MACD values so far; the signal line is seeded with their SMA
+        if count < MACD_SIGNAL:
+            state.ema_signal += macd
+            return
+        if count == MACD_SIGNAL:
+            state.ema_signal = (state.ema_signal + macd) / MACD_SIGNAL
+        else:
+            state.ema_signal += (macd - state.ema_signal) * MACD_K_SIGNAL
+        state.macd = macd
+        state.macd_signal = state.ema_signal
+
+    def _update_bbands(self, state, price):
+        """Slide the coin's Bollinger window by one price, updating the bands from running sums."""
+        window = state.bb_window
+        if len(window) == BBANDS_PERIOD:
+            old = window[0]
+            state.bb_sum -= old
+            state.bb_sumsq -= old * old
+        window.append(price)
+        if (state.no + 1) % BBANDS_PERIOD == 0:
+            # Re-sum once per full rotation so rounding from the subtractions cannot build up
+            state.bb_sum = math.fsum(window)
+            state.bb_sumsq = math.fsum(p * p for p in window)
+        else:
+            state.bb_sum += price
+            state.bb_sumsq += price * price
+        if len(window) < BBANDS_PERIOD:
+            return
+        mean = state.bb_sum / BBANDS_PERIOD
+        std = math.sqrt(max(state.bb_sumsq / BBANDS_PERIOD - mean * mean, 0.0))
+        state.bb_middle = mean
+        state.bb_upper = mean + BBANDS_NBDEV * std
+        state.bb_lower = mean - BBANDS_NBDEV * std
+
     def update_price_mean(self, coin, price):
         state = self.get_strategy_state(coin)
+        if state.no:
+            self._update_rsi(state, price - self.price_data[coin].last())
+        self._update_macd(state, price)
+        self._update_bbands(state, price)
         self.update_price_data(coin, price)
-        if state["price_mean"] == 0:
-            state["price_mean"] = price
+        if state.price_mean == 0:
+            state.price_mean = price
         else:
-            state["price_mean"] = (state["price_mean"] * state["no"] + price) / (state["no"] + 1)
-        state["no"] += 1
+            state.price_mean = (state.price_mean * state.no + price) / (state.no + 1)
+        state.no += 1
 
     def select_best_strategy(self, coin):
         state = self.get_strategy_state(coin)
@@ -587,180 +1103,140 @@ class AutonomousStrategy:
                 for strat in self.strategy_performance[coin]
             }
             best_strategy = max(normalized_scores, key=normalized_scores.get)
-        state["active_strategy"] = best_strategy
+        state.active_strategy = best_strategy
+        state.strategy_tick = state.no
+        state.strategy_dirty = False
         logging.info(f"{coin} - Selected strategy: {best_strategy}")
         return best_strategy
 
+    def _evaluate_signal(self, strategy_name, coin, price, indicators):
+        """Run the compiled signal rules for one strategy, logging stop-loss and take-profit exits."""
+        state = self.get_strategy_state(coin)
+        values = indicators or {}
+        code = evaluate_signal(
+            STRATEGY_IDS[strategy_name], price, state.position_status == "HOLDING",
+            _as_float(state.buy_price), _as_float(state.stop_loss_price), _as_float(state.take_profit_price),
+            state.price_mean, values.get("rsi", np.nan), values.get("macd", np.nan), values.get("macd_signal", np.nan),
+            values.get("bb_upper", np.nan), values.get("bb_lower", np.nan),
+            values.get("stoch_k", np.nan), values.get("stoch_d", np.nan))
+        if code == SIGNAL_STOP_LOSS:
+            logging.info(f"{coin} - Stop Loss Triggered at {price:.6f}")
+        elif code == SIGNAL_TAKE_PROFIT:
+            logging.info(f"{coin} - Take Profit Triggered at {price:.6f}")
+        return code
+
+    def _open_position(self, coin, price):
+        state = self.get_strategy_state(coin)
+        state.position_status = "HOLDING"
+        self.set_risk_levels(coin, price * 1.001)
+
+    def _close_position(self, coin, price):
+        """Mark the coin as back in cash and return the profit percentage of the closed position."""
+        state = self.get_strategy_state(coin)
+        state.position_status = "CASH"
+        profit_pct = ((price / state.buy_price) - 1) * 100 if state.buy_price else 0
+        state.buy_price = None
+        state.stop_loss_price = None
+        state.take_profit_price = None
+        return profit_pct
+
     def mean_reversion_strategy(self, coin, price, indicators):
         state = self.get_strategy_state(coin)
-        if state["no"] <= self.lookback_period:
+        if state.no <= self.lookback_period:
             return "HOLD"
 
-        if state["position_status"] == "HOLDING":
-            if price <= state["stop_loss_price"]:
-                logging.info(f"{coin} - Stop Loss Triggered at {price:.6f}")
-                return "SELL"
-            if price >= state["take_profit_price"]:
-                logging.info(f"{coin} - Take Profit Triggered at {price:.6f}")
-                return "SELL"
-
-        if state["price_mean"] > price and state["position_status"] == "CASH":
-            signal = "BUY"
-            state["position_status"] = "HOLDING"
-            self.set_risk_levels(coin, price * 1.001)
-            logging.info(f"{coin} - BUY Signal (Mean Reversion): Price {price:.6f} below Mean {state['price_mean']:.6f}")
-        elif price > state["price_mean"] and state["position_status"] == "HOLDING":
-            if price > state["buy_price"] * 1.003:
-                signal = "SELL"
-                state["position_status"] = "CASH"
-                profit_pct = ((price / state["buy_price"]) - 1) * 100 if state["buy_price"] else 0
-                logging.info(f"{coin} - SELL Signal (Mean Reversion): Profit {profit_pct:.2f}%")
-                state["buy_price"] = None
-                state["stop_loss_price"] = None
-                state["take_profit_price"] = None
-            else:
-                signal = "HOLD"
-        else:
-            signal = "HOLD"
-        return signal
+        code = self._evaluate_signal("mean_reversion", coin, price, indicators)
+        if code == SIGNAL_BUY:
+            self._open_position(coin, price)
+            logging.info(f"{coin} - BUY Signal (Mean Reversion): Price {price:.6f} below Mean {state.price_mean:.6f}")
+        elif code == SIGNAL_SELL:
+            profit_pct = self._close_position(coin, price)
+            logging.info(f"{coin} - SELL Signal (Mean Reversion): Profit {profit_pct:.2f}%")
+        return SIGNAL_NAMES[code]
 
     def macd_crossover_strategy(self, coin, price, indicators):
         state = self.get_strategy_state(coin)
-        if not indicators or state["no"] <= self.lookback_period:
+        if not indicators or state.no <= self.lookback_period:
             return "HOLD"
 
-        if state["position_status"] == "HOLDING":
-            if price <= state["stop_loss_price"]:
-                logging.info(f"{coin} - Stop Loss Triggered at {price:.6f}")
-                return "SELL"
-            if price >= state["take_profit_price"]:
-                logging.info(f"{coin} - Take Profit Triggered at {price:.6f}")
-                return "SELL"
-
+        code = self._evaluate_signal("macd_crossover", coin, price, indicators)
         macd = indicators["macd"]
         signal_line = indicators["macd_signal"]
         rsi = indicators["rsi"]
-
-        if macd > signal_line and rsi < RSI_OVERBOUGHT and state["position_status"] == "CASH":
-            signal = "BUY"
-            state["position_status"] = "HOLDING"
-            self.set_risk_levels(coin, price * 1.001)
+        if code == SIGNAL_BUY:
+            self._open_position(coin, price)
             logging.info(f"{coin} - BUY Signal (MACD): MACD {macd:.6f} > Signal {signal_line:.6f}, RSI {rsi:.2f}")
-        elif macd < signal_line and rsi > RSI_OVERSOLD and state["position_status"] == "HOLDING":
-            signal = "SELL"
-            state["position_status"] = "CASH"
-            profit_pct = ((price / state["buy_price"]) - 1) * 100 if state["buy_price"] else 0
+        elif code == SIGNAL_SELL:
+            profit_pct = self._close_position(coin, price)
             logging.info(f"{coin} - SELL Signal (MACD): MACD {macd:.6f} < Signal {signal_line:.6f}, RSI {rsi:.2f}, Profit {profit_pct:.2f}%")
-            state["buy_price"] = None
-            state["stop_loss_price"] = None
-            state["take_profit_price"] = None
-        else:
-            signal = "HOLD"
-        return signal
+        return SIGNAL_NAMES[code]
 
     def rsi_strategy(self, coin, price, indicators):
         state = self.get_strategy_state(coin)
-        if not indicators or state["no"] <= self.lookback_period:
+        if not indicators or state.no <= self.lookback_period:
             return "HOLD"
 
-        if state["position_status"] == "HOLDING":
-            if price <= state["stop_loss_price"]:
-                logging.info(f"{coin} - Stop Loss Triggered at {price:.6f}")
-                return "SELL"
-            if price >= state["take_profit_price"]:
-                logging.info(f"{coin} - Take Profit Triggered at {price:.6f}")
-                return "SELL"
-
+        code = self._evaluate_signal("rsi_strategy", coin, price, indicators)
         rsi = indicators["rsi"]
         stoch_k = indicators["stoch_k"]
         stoch_d = indicators["stoch_d"]
-
-        if rsi < RSI_OVERSOLD and stoch_k < 20 and stoch_k > stoch_d and state["position_status"] == "CASH":
-            signal = "BUY"
-            state["position_status"] = "HOLDING"
-            self.set_risk_levels(coin, price * 1.001)
+        if code == SIGNAL_BUY:
+            self._open_position(coin, price)
             logging.info(f"{coin} - BUY Signal (RSI): RSI {rsi:.2f}, Stoch K {stoch_k:.2f}, Stoch D {stoch_d:.2f}")
-        elif rsi > RSI_OVERBOUGHT and stoch_k > 80 and stoch_k < stoch_d and state["position_status"] == "HOLDING":
-            signal = "SELL"
-            state["position_status"] = "CASH"
-            profit_pct = ((price / state["buy_price"]) - 1) * 100 if state["buy_price"] else 0
+        elif code == SIGNAL_SELL:
+            profit_pct = self._close_position(coin, price)
             logging.info(f"{coin} - SELL Signal (RSI): RSI {rsi:.2f}, Stoch K {stoch_k:.2f}, Stoch D {stoch_d:.2f}, Profit {profit_pct:.2f}%")
-            state["buy_price"] = None
-            state["stop_loss_price"] = None
-            state["take_profit_price"] = None
-        else:
-            signal = "HOLD"
-        return signal
+        return SIGNAL_NAMES[code]
 
     def bollinger_bands_strategy(self, coin, price, indicators):
         state = self.get_strategy_state(coin)
-        if not indicators or state["no"] <= self.lookback_period:
+        if not indicators or state.no <= self.lookback_period:
             return "HOLD"
 
-        if state["position_status"] == "HOLDING":
-            if price <= state["stop_loss_price"]:
-                logging.info(f"{coin} - Stop Loss Triggered at {price:.6f}")
-                return "SELL"
-            if price >= state["take_profit_price"]:
-                logging.info(f"{coin} - Take Profit Triggered at {price:.6f}")
-                return "SELL"
-
+        code = self._evaluate_signal("bollinger_bands", coin, price, indicators)
         bb_upper = indicators["bb_upper"]
         bb_lower = indicators["bb_lower"]
         rsi = indicators["rsi"]
-
-        if price < bb_lower and rsi < RSI_OVERSOLD and state["position_status"] == "CASH":
-            signal = "BUY"
-            state["position_status"] = "HOLDING"
-            self.set_risk_levels(coin, price * 1.001)
+        if code == SIGNAL_BUY:
+            self._open_position(coin, price)
             logging.info(f"{coin} - BUY Signal (BBands): Price {price:.6f} < Lower {bb_lower:.6f}, RSI {rsi:.2f}")
-        elif price > bb_upper and rsi > RSI_OVERBOUGHT and state["position_status"] == "HOLDING":
-            signal = "SELL"
-            state["position_status"] = "CASH"
-            profit_pct = ((price / state["buy_price"]) - 1) * 100 if state["buy_price"] else 0
+        elif code == SIGNAL_SELL:
+            profit_pct = self._close_position(coin, price)
             logging.info(f"{coin} - SELL Signal (BBands): Price {price:.6f} > Upper {bb_upper:.6f}, RSI {rsi:.2f}, Profit {profit_pct:.2f}%")
-            state["buy_price"] = None
-            state["stop_loss_price"] = None
-            state["take_profit_price"] = None
-        else:
-            signal = "HOLD"
-        return signal
+        return SIGNAL_NAMES[code]
 
     def combined_strategy(self, coin, price, indicators):
         state = self.get_strategy_state(coin)
-        if not indicators or state["no"] <= self.lookback_period:
+        # Take this tick's signals from generate_signal before any early return, so they never leak into a later tick
+        signals, state.tick_signals = state.tick_signals, None
+        if not indicators or state.no <= self.lookback_period:
             return "HOLD"
 
-        if state["position_status"] == "HOLDING":
-            if price <= state["stop_loss_price"]:
-                logging.info(f"{coin} - Stop Loss Triggered at {price:.6f}")
-                return "SELL"
-            if price >= state["take_profit_price"]:
-                logging.info(f"{coin} - Take Profit Triggered at {price:.6f}")
-                return "SELL"
-
-        signals = [
-            self.macd_crossover_strategy(coin, price, indicators),
-            self.rsi_strategy(coin, price, indicators),
-            self.bollinger_bands_strategy(coin, price, indicators)
-        ]
+        # The combined id only applies the stop-loss/take-profit exits; entries are voted below
+        code = self._evaluate_signal("combined", coin, price, indicators)
+        if code != SIGNAL_HOLD:
+            return SIGNAL_NAMES[code]
+
+        # Vote on the signals generate_signal already produced this tick; run them only when called on its own
+        if signals is None:
+            signals = (
+                self.macd_crossover_strategy(coin, price, indicators),
+                self.rsi_strategy(coin, price, indicators),
+                self.bollinger_bands_strategy(coin, price, indicators)
+            )
+        macd_signal, rsi_signal, bb_signal = signals
 
-        buy_count = signals.count("BUY")
-        sell_count = signals.count("SELL")
+        buy_count = (macd_signal == "BUY") + (rsi_signal == "BUY") + (bb_signal == "BUY")
+        sell_count = (macd_signal == "SELL") + (rsi_signal == "SELL") + (bb_signal == "SELL")
 
-        if buy_count >= 2 and state["position_status"] == "CASH":
+        if buy_count >= 2 and state.position_status == "CASH":
             signal = "BUY"
-            state["position_status"] = "HOLDING"
-            self.set_risk_levels(coin, price * 1.001)
+            self._open_position(coin, price)
             logging.info(f"{coin} - BUY Signal (Combined): {buy_count}/3 strategies agree")
-        elif sell_count >= 2 and state["position_status"] == "HOLDING":
+        elif sell_count >= 2 and state.position_status == "HOLDING":
             signal = "SELL"
-            state["position_status"] = "CASH"
-            profit_pct = ((price / state["buy_price"]) - 1) * 100 if state["buy_price"] else 0
+            profit_pct = self._close_position(coin, price)
             logging.info(f"{coin} - SELL Signal (Combined): {sell_count}/3 strategies agree, Profit {profit_pct:.2f}%")
-            state["buy_price"] = None
-            state["stop_loss_price"] = None
-            state["take_profit_price"] = None
         else:
             signal = "HOLD"
         return signal
@@ -769,10 +1245,12 @@ class AutonomousStrategy:
         if signal == "SELL" and profit_pct:
             self.strategy_performance[coin][strategy] += profit_pct
             self.strategy_trade_count[coin][strategy] += 1
+            self.strategies[coin].strategy_dirty = True
         elif signal == "BUY":
             self.strategy_performance[coin][strategy] += 0.1
             self.strategy_trade_count[coin][strategy] += 1
-        # Apply decay
+            self.strategies[coin].strategy_dirty = True
+        # Apply decay; it scales every strategy alike, so on its own it never changes the best one
         decay_factor = 0.99
         for strat in self.strategy_performance[coin]:
             self.strategy_performance[coin][strat] *= decay_factor
@@ -780,21 +1258,25 @@ class AutonomousStrategy:
     def generate_signal(self, coin, price):
         state = self.get_strategy_state(coin)
         indicators = self.calculate_indicators(coin)
-        active_strategy = self.select_best_strategy(coin)
+        # Keep the selected strategy between ticks; reselect periodically so exploration continues
+        if state.strategy_dirty or state.no - state.strategy_tick >= STRATEGY_RESELECT_EVERY:
+            self.select_best_strategy(coin)
+        active_strategy = state.active_strategy
         
         # Generate signals for all strategies
         signals = {
             "mean_reversion": self.mean_reversion_strategy(coin, price, indicators),
             "macd_crossover": self.macd_crossover_strategy(coin, price, indicators),
             "rsi_strategy": self.rsi_strategy(coin, price, indicators),
-            "bollinger_bands": self.bollinger_bands_strategy(coin, price, indicators),
-            "combined": self.combined_strategy(coin, price, indicators)
+            "bollinger_bands": self.bollinger_bands_strategy(coin, price, indicators)
         }
+        state.tick_signals = (signals["macd_crossover"], signals["rsi_strategy"], signals["bollinger_bands"])
+        signals["combined"] = self.combined_strategy(coin, price, indicators)
         
         # Update performance for all strategies
         for strategy, signal in signals.items():
-            if signal == "SELL" and state["position_status"] == "HOLDING" and state["buy_price"]:
-                profit_pct = ((price / state["buy_price"]) - 1) * 100
+            if signal == "SELL" and state.position_status == "HOLDING" and state.buy_price:
+                profit_pct = ((price / state.buy_price) - 1) * 100
                 self.update_strategy_performance(coin, strategy, signal, profit_pct)
             elif signal == "BUY":
                 self.update_strategy_performance(coin, strategy, signal)
@@ -807,22 +1289,29 @@ class AutonomousStrategy:
 # --- RISK MANAGEMENT ---
 class RiskManager:
     def __init__(self):
-        self.portfolio_values = []
+        # Running count/mean/M2 of the excess returns, so the Sharpe ratio is O(1) per tick
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._last = None
 
     def update_portfolio(self, value):
-        self.portfolio_values.append(value)
+        if self._last is not None:
+            r = value / self._last - 1 - RISK_FREE_RATE
+            # Welford update, as in AutonomousStrategy._add_return
+            self._n += 1
+            delta = r - self._mean
+            self._mean += delta / self._n
+            self._m2 += delta * (r - self._mean)
+        self._last = value
 
     def calculate_sharpe_ratio(self):
-        if len(self.portfolio_values) < 2:
+        if self._n < 1:
             return 0
-        returns = np.diff(self.portfolio_values) / self.portfolio_values[:-1]
-        excess_returns = returns - RISK_FREE_RATE
-        mean_return = np.mean(excess_returns)
-        std_return = np.std(excess_returns)
+        std_return = math.sqrt(self._m2 / self._n)
         if std_return == 0:
             return 0
-        sharpe_ratio = mean_return / std_return
-        return sharpe_ratio
+        return self._mean / std_return
 
 # --- SIMULATION BOT ---
 class SimulationBot:
@@ -832,21 +1321,40 @@ class SimulationBot:
         self.api_client = api_client
         self.coin_selector = coin_selector
         self.cash = initial_cash
-        self.holdings = {}
-        self.entry_prices = {}
+        # Holdings as parallel arrays: coin -> slot, amount held and last seen price per slot
+        self._coin_idx = {}
+        self._amounts = np.zeros(0, dtype=np.float64)
+        self._prices_vec = np.zeros(0, dtype=np.float64)
+        self.entry_prices = defaultdict(deque)  # FIFO of entry prices per coin
+        self.pairs = {}  # coin -> pair it was last traded on, used to close positions on shutdown
         self.initial_portfolio_value = initial_cash
         self.trade_count = 0
         self.profitable_trades = 0
     
+    def _slot(self, coin):
+        """Return coin's index into the holdings arrays, growing them for a new coin."""
+        idx = self._coin_idx.get(coin)
+        if idx is None:
+            idx = self._coin_idx[coin] = len(self._coin_idx)
+            if idx == len(self._amounts):
+                extra = np.zeros(max(16, idx), dtype=np.float64)
+                self._amounts = np.concatenate((self._amounts, extra))
+                self._prices_vec = np.concatenate((self._prices_vec, extra))
+        return idx
+
+    def record_price(self, coin, price):
+        idx = self._slot(coin)  # May replace the arrays, so resolve it before indexing
+        self._prices_vec[idx] = price
+
     def get_open_trades_count(self):
         """Return the number of open trades (coins with non-zero holdings)."""
-        return sum(1 for amount in self.holdings.values() if amount > 0)
+        return int((self._amounts > 0).sum())
 
-    def update_portfolio_value(self, prices):
-        portfolio_value = self.cash
-        for coin, amount in self.holdings.items():
-            price = prices.get(coin, 0)
-            portfolio_value += amount * price
+    def position_value(self):
+        return float(self._amounts @ self._prices_vec)
+
+    def update_portfolio_value(self):
+        portfolio_value = self.cash + self.position_value()
         self.risk_manager.update_portfolio(portfolio_value)
         return portfolio_value
 
@@ -856,19 +1364,16 @@ class SimulationBot:
         available_risk = max(0, portfolio_value * MAX_PORTFOLIO_RISK - current_position_value)
         risk_amount = min(risk_amount, available_risk)
         trade_qty = risk_amount / price
-        trade_qty = math.floor(trade_qty * 10000) / 10000
+        trade_qty = int(trade_qty * QTY_SCALE) / QTY_SCALE  # Truncation equals floor here, as trade_qty >= 0
         return max(0.001, trade_qty)
 
-    def simulate_trade(self, coin, pair, signal, price, score, total_score, prices):
-        portfolio_value = self.update_portfolio_value(prices)
-        current_position_value = sum(amount * prices.get(c, 0) for c, amount in self.holdings.items() if amount > 0)
+    def simulate_trade(self, coin, pair, signal, price, score, total_score):
+        idx = self._slot(coin)
+        self.pairs[coin] = pair
+        portfolio_value = self.update_portfolio_value()
+        current_position_value = self.position_value()
         trade_amount = self.calculate_trade_amount(price, portfolio_value, score, total_score, current_position_value)
 
-        if coin not in self.holdings:
-            self.holdings[coin] = 0
-        if coin not in self.entry_prices:
-            self.entry_prices[coin] = []
-
         timestamp = datetime.now()
         append_price_history(coin, timestamp, price)
 
@@ -878,14 +1383,14 @@ class SimulationBot:
                 return
             new_position_value = trade_amount * price
             if current_position_value + new_position_value <= portfolio_value * MAX_PORTFOLIO_RISK:
-                self.holdings[coin] += trade_amount
+                self._amounts[idx] += trade_amount
                 purchase_amount = trade_amount * price
                 commission = purchase_amount * BUYING_COMMISSION
                 total_cost = purchase_amount + commission
                 self.cash -= total_cost
                 self.entry_prices[coin].append(price)
                 trade = {
-                    "timestamp": datetime.now(),
+                    "timestamp": timestamp,
                     "action": "BUY",
                     "coin": coin,
                     "pair": pair,
@@ -896,28 +1401,28 @@ class SimulationBot:
                     "total_cost": total_cost,
                     "cash_balance": self.cash
                 }
-                append_trade_to_file(trade, initial_portfolio_value=self.initial_portfolio_value)
+                append_trade_to_file(trade)
                 self.coin_selector.update_trade_history(coin, trade)
                 logging.info(f"BUY: {trade_amount} {coin} at {price}, Spent: {purchase_amount:.6f}, Commission: {commission:.6f}, Total: {total_cost:.6f}")
                 self.api_client.place_order(coin, "BUY", trade_amount)
                 logging.info(f"Portfolio Value after BUY: {portfolio_value:.2f}")
             else:
                 logging.info(f"{coin} - BUY signal ignored - exceeds portfolio risk limit")
-        elif signal == "SELL" and self.holdings.get(coin, 0) >= trade_amount:
-            sale_amount = self.holdings[coin] * price
+        elif signal == "SELL" and self._amounts[idx] >= trade_amount:
+            trade_amount = float(self._amounts[idx])
+            sale_amount = trade_amount * price
             commission = sale_amount * SELLING_COMMISSION
             net_proceeds = sale_amount - commission
-            trade_amount = self.holdings[coin]
-            self.holdings[coin] = 0
+            self._amounts[idx] = 0
             self.cash += net_proceeds
             self.trade_count += 1
             if self.entry_prices[coin]:
-                entry_price = self.entry_prices[coin].pop(0)
+                entry_price = self.entry_prices[coin].popleft()
                 buy_cost = trade_amount * entry_price * (1 + BUYING_COMMISSION)
                 profit = net_proceeds - buy_cost
                 profit_pct = (net_proceeds / buy_cost - 1) * 100 if buy_cost else 0
                 trade = {
-                    "timestamp": datetime.now(),
+                    "timestamp": timestamp,
                     "action": "SELL",
                     "coin": coin,
                     "pair": pair,
@@ -932,11 +1437,11 @@ class SimulationBot:
                 if profit > 0:
                     self.profitable_trades += 1
                 state = self.strategy.get_strategy_state(coin)
-                self.strategy.update_strategy_performance(coin, state["active_strategy"], "SELL", profit_pct)
+                self.strategy.update_strategy_performance(coin, state.active_strategy, "SELL", profit_pct)
                 logging.info(f"{coin} - Trade P&L: {profit:.6f} ({profit_pct:.2f}%)")
             else:
                 trade = {
-                    "timestamp": datetime.now(),
+                    "timestamp": timestamp,
                     "action": "SELL",
                     "coin": coin,
                     "pair": pair,
@@ -947,155 +1452,182 @@ class SimulationBot:
                     "net_proceeds": net_proceeds,
                     "cash_balance": self.cash
                 }
-            append_trade_to_file(trade, initial_portfolio_value=self.initial_portfolio_value)
+            append_trade_to_file(trade)
             self.coin_selector.update_trade_history(coin, trade)
             logging.info(f"SELL: {trade_amount} {coin} at {price}, Received: {sale_amount:.6f}, Commission: {commission:.6f}, Net: {net_proceeds:.6f}")
             self.api_client.place_order(coin, "SELL", trade_amount)
             logging.info(f"Portfolio Value after SELL: {portfolio_value:.2f}")
 
-    def run_simulation(self):
-        logging.info("Starting multi-coin simulation (runs until manually stopped)...")
-        initial_portfolio_value = self.cash
-        logging.info(f"Initial Portfolio Value: {initial_portfolio_value:.2f}")
-
-        try:
+    async def _simulation_loop(self):
+        async with AsyncRoostooAPIClient(self.api_client.base_url) as client:
             while True:
                 try:
-                    selected_coins = self.coin_selector.select_coins()
+                    held = [(coin, self.pairs[coin]) for coin, idx in self._coin_idx.items() if self._amounts[idx] > 0]
+                    selected_coins = await self.coin_selector.select_coins(held)
                     logging.info(f"Processing {len(selected_coins)} coins: {[c for c, p in selected_coins]}")
 
-                    prices = {}
-                    scores = {}
+                    # Fetch all tickers in one request, concurrently re-requesting only the pairs it missed;
+                    # the trading decisions below stay sequential
+                    ticker_data = ticker_map(await client.get_all_tickers())
+                    missing = [pair for _, pair in selected_coins if pair not in ticker_data]
+                    if missing:
+                        ticker_results = await asyncio.gather(*(client.get_ticker(pair) for pair in missing),
+                                                              return_exceptions=True)
+                        for result in ticker_results:
+                            if not isinstance(result, Exception):
+                                ticker_data.update(ticker_map(result))
+
+                    # First pass prices and scores every coin, so position sizing sees the whole cycle's total score
+                    quotes = []
                     for coin, pair in selected_coins:
                         try:
-                            ticker_data = self.api_client.get_ticker(pair=pair)
-                            if ticker_data and ticker_data.get("Success"):
-                                price = float(ticker_data["Data"][pair]["LastPrice"])
-                                prices[coin] = price
-                                score = self.coin_selector.calculate_coin_score(coin, pair)
-                                scores[coin] = score
-                                current_time = datetime.now()
-
-                                logging.info(f"Time: {current_time} | Coin: {coin} | Price: {price} | Score: {score:.2f}")
-                                self.strategy.update_price_mean(coin, price)
-                                signal = self.strategy.generate_signal(coin, price)
-                                logging.info(f"{coin} - Signal: {signal}")
-
-                                if signal in ["BUY", "SELL"]:
-                                    total_score = sum(scores.values())
-                                    self.simulate_trade(coin, pair, signal, price, score, total_score, prices)
+                            if pair in ticker_data:
+                                price = float(ticker_data[pair]["LastPrice"])
+                                self.record_price(coin, price)
+                                quotes.append((coin, pair, price, self.coin_selector.calculate_coin_score(coin, pair)))
+                        except Exception as e:
+                            logging.error(f"Error processing {coin}: {e}")
+                    total_score = sum(score for _, _, _, score in quotes)
+
+                    current_time = datetime.now()
+                    for coin, pair, price, score in quotes:
+                        try:
+                            logging.info(f"Time: {current_time} | Coin: {coin} | Price: {price} | Score: {score:.2f}")
+                            self.strategy.update_price_mean(coin, price)
+                            signal = self.strategy.generate_signal(coin, price)
+                            logging.info(f"{coin} - Signal: {signal}")
+
+                            if signal in ["BUY", "SELL"]:
+                                self.simulate_trade(coin, pair, signal, price, score, total_score)
 
                         except Exception as e:
                             logging.error(f"Error processing {coin}: {e}")
 
-                    portfolio_value = self.update_portfolio_value(prices)
-                    active_positions = sum(1 for amount in self.holdings.values() if amount > 0)
+                    portfolio_value = self.update_portfolio_value()
+                    active_positions = self.get_open_trades_count()
                     logging.info(f"Portfolio Value: {portfolio_value:.2f}, Active Positions: {active_positions}")
 
                 except Exception as e:
                     logging.error(f"Error in simulation loop: {e}")
 
-                time.sleep(FETCH_INTERVAL)
+                await asyncio.sleep(FETCH_INTERVAL)
+
+    def run_simulation(self):
+        logging.info("Starting multi-coin simulation (runs until manually stopped)...")
+        initial_portfolio_value = self.cash
+        logging.info(f"Initial Portfolio Value: {initial_portfolio_value:.2f}")
+        write_session_meta(started_at=datetime.now().isoformat(timespec="seconds"),
+                           initial_portfolio_value=initial_portfolio_value,
+                           trade_log=TRADE_LOG_FILENAME,
+                           trade_histories=f"{DATA_DIR}/trade_history_<coin>.jsonl",
+                           price_histories=f"{DATA_DIR}/price_history_<coin>.csv")
+
+        try:
+            asyncio.run(self._simulation_loop())
 
         except KeyboardInterrupt:
             logging.info("Bot interrupted by user. Closing all open positions...")
-            final_prices = {}
-            for coin, amount in list(self.holdings.items()):
-                if amount > 0:
-                    try:
-                        pair = next((p for c, p in self.coin_selector.select_coins() if c == coin), None)
-                        if not pair:
-                            logging.error(f"No pair found for {coin} during final sell")
-                            continue
-                        price_history = read_price_history(coin)
-                        lookback_samples = min(len(price_history), int(60 / FETCH_INTERVAL))
-                        recent_prices = [float(record["price"]) for record in price_history[-lookback_samples:]] if price_history else []
-                        highest_price = max(recent_prices) if recent_prices else 0
-                        ticker_data = self.api_client.get_ticker(pair=pair)
-                        if ticker_data and ticker_data.get("Success"):
-                            current_price = float(ticker_data["Data"][pair]["LastPrice"])
-                            highest_price = max(highest_price, current_price) if highest_price else current_price
-
-                        final_prices[coin] = highest_price
-                        sale_amount = amount * highest_price
-                        commission = sale_amount * SELLING_COMMISSION
-                        net_proceeds = sale_amount - commission
-                        self.cash += net_proceeds
-                        trade = {
-                            "timestamp": datetime.now(),
-                            "action": "FINAL_SELL",
-                            "coin": coin,
-                            "pair": pair,
-                            "price": highest_price,
-                            "amount": amount,
-                            "cash_received": sale_amount,
-                            "commission": commission,
-                            "net_proceeds": net_proceeds,
-                            "cash_balance": self.cash
-                        }
-                        append_trade_to_file(trade, initial_portfolio_value=self.initial_portfolio_value)
-                        self.coin_selector.update_trade_history(coin, trade)
-                        logging.info(f"Final SELL: {amount} {coin} at {highest_price:.2f}, Net Proceeds: {net_proceeds:.2f}")
-                        self.api_client.place_order(coin, "SELL", amount)
-                        self.holdings[coin] = 0
-                    except Exception as e:
-                        logging.error(f"Error during final sell for {coin}: {e}")
-
-            final_portfolio_value = self.update_portfolio_value(final_prices)
+            held = [(coin, idx) for coin, idx in self._coin_idx.items() if self._amounts[idx] > 0]
+            pair_map = dict(self.pairs)
+            if any(coin not in pair_map for coin, _ in held):
+                # Run the selection once for all held coins, not once per coin
+                try:
+                    for c, p in asyncio.run(self.coin_selector.select_coins()):
+                        pair_map.setdefault(c, p)
+                except Exception as e:
+                    logging.error(f"Error selecting coins during final sell: {e}")
+            closed_at = datetime.now()
+            for coin, idx in held:
+                amount = float(self._amounts[idx])
+                try:
+                    pair = pair_map.get(coin)
+                    if not pair:
+                        logging.error(f"No pair found for {coin} during final sell")
+                        continue
+                    last_prices = recent_prices(coin)
+                    highest_price = max(last_prices) if last_prices else 0
+                    ticker_data = self.api_client.get_ticker(pair=pair)
+                    if ticker_data and ticker_data.get("Success"):
+                        current_price = float(ticker_data["Data"][pair]["LastPrice"])
+                        highest_price = max(highest_price, current_price) if highest_price else current_price
+
+                    self._prices_vec[idx] = highest_price
+                    sale_amount = amount * highest_price
+                    commission = sale_amount * SELLING_COMMISSION
+                    net_proceeds = sale_amount - commission
+                    self.cash += net_proceeds
+                    trade = {
+                        "timestamp": closed_at,
+                        "action": "FINAL_SELL",
+                        "coin": coin,
+                        "pair": pair,
+                        "price": highest_price,
+                        "amount": amount,
+                        "cash_received": sale_amount,
+                        "commission": commission,
+                        "net_proceeds": net_proceeds,
+                        "cash_balance": self.cash
+                    }
+                    append_trade_to_file(trade)
+                    self.coin_selector.update_trade_history(coin, trade)
+                    logging.info(f"Final SELL: {amount} {coin} at {highest_price:.2f}, Net Proceeds: {net_proceeds:.2f}")
+                    self.api_client.place_order(coin, "SELL", amount)
+                    self._amounts[idx] = 0
+                except Exception as e:
+                    logging.error(f"Error during final sell for {coin}: {e}")
+
+            final_portfolio_value = self.update_portfolio_value()
             sharpe_ratio = self.risk_manager.calculate_sharpe_ratio()
-            append_trade_to_file({}, initial_portfolio_value=initial_portfolio_value, final_portfolio_value=final_portfolio_value, sharpe_ratio=sharpe_ratio)
+            write_session_meta(terminated_at=datetime.now().isoformat(timespec="seconds"),
+                               final_portfolio_value=final_portfolio_value, sharpe_ratio=sharpe_ratio,
+                               trade_count=self.trade_count, profitable_trades=self.profitable_trades)
             logging.info(f"Simulation Terminated. Final Portfolio Value: {final_portfolio_value:.2f}")
             logging.info(f"Win Rate: {self.profitable_trades/self.trade_count*100:.2f}% ({self.profitable_trades}/{self.trade_count})" if self.trade_count > 0 else "No trades executed")
             return final_portfolio_value, sharpe_ratio
 
 # --- UTILITY FUNCTIONS ---
-def append_trade_to_file(trade, initial_portfolio_value=None, final_portfolio_value=None, sharpe_ratio=None):
+def append_trade_to_file(trade):
+    """Queue trade as one JSON line of the trade log for the history writer thread."""
     try:
-        ensure_data_directory()
-        filename = os.path.join(DATA_DIR, "trade_log.txt")
-        file_exists = os.path.exists(filename)
-        with open(filename, "a") as file:
-            if not file_exists:
-                file.write(f"Trade Log - Started on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                file.write("=" * 80 + "\n\n")
-                if initial_portfolio_value is not None:
-                    file.write(f"Initial Portfolio Value: {initial_portfolio_value:.2f}\n")
-                file.write(f"Coin-specific trade histories are saved in: {DATA_DIR}/trade_history_<coin>.json\n")
-                file.write(f"Coin-specific price histories are saved in: {DATA_DIR}/price_history_<coin>.csv\n\n")
-                file.write("DETAILED TRADE LOG:\n")
-                file.write("-" * 80 + "\n")
-            if final_portfolio_value is not None:
-                file.write("=" * 80 + "\n")
-                file.write(f"Simulation Terminated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                file.write(f"Final Portfolio Value: {final_portfolio_value:.2f}\n")
-                if sharpe_ratio is not None:
-                    file.write(f"Sharpe Ratio: {sharpe_ratio:.4f}\n")
-                file.write("=" * 80 + "\n\n")
-            else:
-                trade_num = sum(1 for line in open(filename) if line.startswith("Trade #")) + 1 if file_exists else 1
-                file.write(f"Trade #{trade_num}:\n")
-                file.write(f"  Timestamp: {trade['timestamp']}\n")
-                file.write(f"  Action: {trade['action']}\n")
-                file.write(f"  Coin: {trade['coin']}\n")
-                file.write(f"  Pair: {trade['pair']}\n")
-                file.write(f"  Price: {trade['price']:.6f}\n")
-                file.write(f"  Amount: {trade['amount']}\n")
-                if 'cash_spent' in trade:
-                    file.write(f"  Cash Spent: {trade['cash_spent']:.6f}\n")
-                    file.write(f"  Buy Commission: {trade['commission']:.6f}\n")
-                    file.write(f"  Total Cost: {trade['total_cost']:.6f}\n")
-                elif 'cash_received' in trade:
-                    file.write(f"  Cash Received: {trade['cash_received']:.6f}\n")
-                    file.write(f"  Sell Commission: {trade['commission']:.6f}\n")
-                    file.write(f"  Net Proceeds: {trade['net_proceeds']:.6f}\n")
-                file.write(f"  Cash Balance: {trade['cash_balance']:.6f}\n")
-                if 'profit_pct' in trade:
-                    file.write(f"  Profit: {trade['profit_pct']:.2f}%\n")
-                file.write("\n")
-        logging.info(f"Trade appended to {filename}")
+        record = trade.copy()
+        record["timestamp"] = record["timestamp"].isoformat()
+        _start_history_writer()
+        _history_queue.put(("log", TRADE_LOG_FILENAME, dumps_json_line(record)))
+        logging.info(f"Trade appended to {TRADE_LOG_FILENAME}")
     except Exception as e:
         logging.error(f"Failed to append trade to file: {e}")
 
+_session_meta = {}
+
+def write_session_meta(**fields):
+    """Merge fields into the session summary and rewrite its JSON file."""
+    try:
+        ensure_data_directory()
+        _session_meta.update(fields)
+        with open(SESSION_META_FILENAME, "w") as f:
+            json.dump(_session_meta, f, indent=2)
+    except Exception as e:
+        logging.error(f"Failed to write session metadata: {e}")
+
+def dump_trades_parquet(filename=None):
+    """Write the JSONL trade log to a Parquet file for offline analysis and return its path (needs pyarrow)."""
+    if pa is None:
+        logging.error("pyarrow is required to dump trades to Parquet")
+        return None
+    flush_history_writes()
+    if not os.path.exists(TRADE_LOG_FILENAME):
+        logging.warning(f"No trade log at {TRADE_LOG_FILENAME}")
+        return None
+    with open(TRADE_LOG_FILENAME, "rb") as f:
+        records = [loads_json(line) for line in f if line.strip()]
+    # BUY and SELL records carry different fields, so give every row the union of columns
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    table = pa.Table.from_pylist([{key: record.get(key) for key in columns} for record in records])
+    filename = filename or os.path.splitext(TRADE_LOG_FILENAME)[0] + ".parquet"
+    pq.write_table(table, filename)
+    logging.info(f"Wrote {len(records)} trades to {filename}")
+    return filename
+
 
 # --- MAIN EXECUTION ---
 def main():